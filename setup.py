@@ -1,6 +1,6 @@
 from setuptools import setup, find_packages
 
-requirements = ["Click", "requests", "python-dateutil", "prettytable"]
+requirements = ["Click>=8.0", "requests", "python-dateutil", "prettytable"]
 
 setup(
     name="utopian",
@@ -11,6 +11,10 @@ setup(
     author_email="amosbastian@gmail.com",
     packages=find_packages(),
     install_requires=requirements,
+    extras_require={
+        "trends": ["numpy"],
+        "export": ["pyarrow"]
+    },
     entry_points="""
         [console_scripts]
         utopian=utopian.utopian:cli
@@ -19,7 +23,6 @@ setup(
         "Development Status :: 3 - Alpha",
         "Intended Audience :: End Users/Desktop",
         "License :: OSI Approved :: MIT License",
-        "Programming Language :: Python :: 2.7",
         "Programming Language :: Python :: 3.6"
     ],
     keywords="utopian cli"
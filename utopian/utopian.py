@@ -1,10 +1,25 @@
+import array
+import bisect
 import click
+import csv
 import datetime
 import json
+import mmap
+import os
 import requests
+import struct
+import subprocess
+import sys
+import threading
+import time
+import uuid
 from dateutil.parser import parse
 from collections import Counter
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from multiprocessing.pool import ThreadPool
 from prettytable import PrettyTable
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qsl, urlsplit
 
 try:
     from urllib import urlencode
@@ -14,19 +29,257 @@ except ImportError:
 UTOPIAN_API = "https://api.utopian.io/api/"
 GITHUB_API = "https://api.github.com/"
 BASE_URL = "https://utopian.io/utopian-io/@{}/{}"
+EPOCH = datetime.datetime(1970, 1, 1)
+SNAPSHOT_MAGIC = b"UTSNAP01"
+SNAPSHOT_HEADER = struct.Struct("<8sQQ")
+SNAPSHOT_COLUMNS = [
+    ("created", "q"),
+    ("moderated", "q"),
+    ("reward", "q"),
+    ("project", "q"),
+    ("author", "I"),
+    ("moderator", "I"),
+    ("category", "I"),
+    ("flagged", "B")
+]
+PREFETCH_WINDOW = 4
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = int(os.environ.get("UTOPIAN_DAEMON_PORT", 5478))
+DAEMON_URL = "http://{}:{}/".format(DAEMON_HOST, DAEMON_PORT)
+DAEMON_NAME = "utopian serve"
+DAEMON_TIMEOUT = 30
+
+COMPLETION_CACHE = os.path.join(os.path.expanduser("~"), ".cache", "utopian",
+    "completion.json")
+COMPLETION_LOCK = COMPLETION_CACHE + ".lock"
+COMPLETION_MAX_AGE = 24 * 60 * 60
+COMPLETION_LOCK_AGE = 60
+RECENT_REPOSITORIES = 50
+
+# Whether requests to the Utopian.io API are routed through `utopian serve`,
+# None until it has been checked if the daemon is running
+use_daemon = None
+# Responses of get_json() by URL, small ones are reused for the life of the
+# process
+cache_responses = True
+json_responses = {}
+json_responses_lock = threading.Lock()
 
 
 @click.group()
-def cli():
-    pass
+@click.option("--format", "output_format", default="table",
+    type=click.Choice(["table", "json", "ndjson", "csv"]),
+    help="Format of the output.")
+@click.pass_context
+def cli(ctx, output_format):
+    ctx.obj = {"format" : output_format}
+
+
+def get_output_format():
+    """
+    Returns the output format chosen with the --format option.
+    """
+    ctx = click.get_current_context(silent=True)
+    if ctx is None or not ctx.find_root().obj:
+        return "table"
+    return ctx.find_root().obj["format"]
+
+class RowWriter(object):
+    """
+    Writes rows in the given output format. Tables are printed once all rows
+    have been added, the other formats are streamed to stdout through a
+    buffer as the rows are added. The "lines" format only writes the first
+    column of each row, and writes every row as soon as it is added.
+    """
+    BUFFER_SIZE = 1000
+
+    def __init__(self, fields, output_format=None, label=None):
+        self.format = output_format or get_output_format()
+        self.label = label
+        if label is not None and self.format != "table":
+            fields = ["Account"] + fields
+        self.fields = fields
+        self.stream = click.get_text_stream("stdout")
+        self.buffer = []
+        self.rows = 0
+        self.table = PrettyTable(fields)
+        if self.format == "csv":
+            self.csv = csv.writer(self, lineterminator="\n")
+            self.csv.writerow(fields)
+
+    @property
+    def align(self):
+        return self.table.align
+
+    @align.setter
+    def align(self, align):
+        self.table.align = align
+
+    def write(self, text):
+        """
+        Adds the given text to the buffer, writing it when it is full.
+        """
+        self.buffer.append(text)
+        if len(self.buffer) >= self.BUFFER_SIZE:
+            self.stream.write("".join(self.buffer))
+            self.buffer = []
+
+    def add_row(self, row, record=None, values=None):
+        """
+        Adds a row to the output. The other formats write the given values
+        (e.g. numbers instead of "80%") instead of the row if there are any,
+        and JSON formats write the given record if there is one.
+        """
+        if self.format == "table":
+            self.table.add_row(row)
+            self.rows += 1
+            return
+        if values is not None:
+            row = values
+        if self.label is not None:
+            row = [self.label] + list(row)
+        if record is None:
+            record = dict(zip(self.fields, row))
+        if self.format == "lines":
+            self.stream.write("{}\n".format(row[0]))
+            self.stream.flush()
+        elif self.format == "csv":
+            self.csv.writerow(row)
+        elif self.format == "ndjson":
+            self.write(json.dumps(record, sort_keys=True) + "\n")
+        else:
+            item = json.dumps(record, indent=4, sort_keys=True)
+            self.write("[\n" if self.rows == 0 else ",\n")
+            self.write("    " + item.replace("\n", "\n    "))
+        self.rows += 1
+
+    def add_total(self, row):
+        """
+        Adds a row of totals, which is only shown in tables so it isn't read
+        as another row by tools parsing the other formats.
+        """
+        if self.format == "table":
+            self.add_row(row)
+
+    def close(self):
+        """
+        Finishes the output and writes whatever is left in the buffer.
+        """
+        if self.format == "table":
+            self.write("{}\n".format(self.table))
+        elif self.format == "json":
+            self.write("\n]\n" if self.rows else "[]\n")
+        self.stream.write("".join(self.buffer))
+        self.stream.flush()
+        self.buffer = []
+
+
+def read_completions():
+    """
+    Returns the cached accounts and repositories used for shell completion.
+    """
+    try:
+        with open(COMPLETION_CACHE) as cache:
+            return json.load(cache)
+    except (IOError, OSError, ValueError):
+        return {}
 
+def write_completions(completions):
+    """
+    Replaces the shell completion cache with the given completions.
+    """
+    directory = os.path.dirname(COMPLETION_CACHE)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    temporary = "{}.{}".format(COMPLETION_CACHE, os.getpid())
+    with open(temporary, "w") as cache:
+        json.dump(completions, cache)
+    os.replace(temporary, COMPLETION_CACHE)
 
-def moderators_table(moderators, sort_by):
+def refresh_completions():
+    """
+    Downloads the moderator and sponsor accounts used for shell completion.
+    """
+    moderators = sorted(moderator["account"] for moderator
+        in get_json("{}moderators".format(UTOPIAN_API))["results"])
+    sponsors = sorted(sponsor["account"] for sponsor
+        in get_json("{}sponsors".format(UTOPIAN_API))["results"])
+    completions = read_completions()
+    completions["moderators"] = moderators
+    completions["sponsors"] = sponsors
+    completions["refreshed"] = time.time()
+    write_completions(completions)
+    try:
+        os.remove(COMPLETION_LOCK)
+    except OSError:
+        pass
+
+def refresh_completions_in_background():
+    """
+    Starts a process that refreshes the completion cache, unless one was
+    already started in the last minute. A refresh that fails leaves the lock
+    behind, so it is retried once the lock has expired.
+    """
+    try:
+        locked = time.time() - os.path.getmtime(COMPLETION_LOCK)
+        if locked < COMPLETION_LOCK_AGE:
+            return
+    except OSError:
+        pass
+    try:
+        directory = os.path.dirname(COMPLETION_LOCK)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        open(COMPLETION_LOCK, "w").close()
+        subprocess.Popen([sys.executable, "-c",
+            "from utopian.utopian import refresh_completions; "
+            "refresh_completions()"], stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            start_new_session=True)
+    except (IOError, OSError):
+        pass
+
+def remember_repository(repository):
+    """
+    Adds the given repository to the recently used repositories.
+    """
+    completions = read_completions()
+    repositories = [recent for recent in completions.get("repositories", [])
+        if recent != repository]
+    completions["repositories"] = [repository] + repositories
+    del completions["repositories"][RECENT_REPOSITORIES:]
+    try:
+        write_completions(completions)
+    except (IOError, OSError):
+        pass
+
+def complete(kind):
+    """
+    Returns a function that completes values of the given kind from the
+    cache. The cache is refreshed by a background process once it is older
+    than a day, so completing never waits for the API.
+    """
+    def completions(ctx, param, incomplete):
+        cache = read_completions()
+        if time.time() - cache.get("refreshed", 0) > COMPLETION_MAX_AGE:
+            refresh_completions_in_background()
+
+        values = cache.get(kind, [])
+        if kind == "repositories":
+            return [value for value in values if value.startswith(incomplete)]
+        # Accounts are sorted, so all values with the prefix are adjacent
+        start = bisect.bisect_left(values, incomplete)
+        end = bisect.bisect_left(values, incomplete + u"\uffff", start)
+        return values[start:end]
+    return completions
+
+
+def moderators_table(moderators, sort_by, output_format=None):
     """
     Creates and prints the moderator table.
     """
-    table = PrettyTable(["ID", "Moderator", "Referrer", "Reviewed",
-                        "% Rewards"])
+    table = RowWriter(["ID", "Moderator", "Referrer", "Reviewed",
+                        "% Rewards"], output_format)
 
     for moderator in sorted(moderators, key=lambda x: x[sort_by], reverse=True):
         if not "referrer" in moderator.keys():
@@ -36,11 +289,14 @@ def moderators_table(moderators, sort_by):
 
         table.add_row([moderator["_id"], moderator["account"], referrer,
             moderator["total_moderated"],
-            str(moderator["percentage_total_rewards_moderators"])[:3]])
+            str(moderator["percentage_total_rewards_moderators"])[:3]],
+            moderator, [moderator["_id"], moderator["account"], referrer,
+            moderator["total_moderated"],
+            moderator["percentage_total_rewards_moderators"]])
     table.align["Moderator"] = "l"
     table.align["Referrer"] = "l"
     table.align["Reviewed"] = "r"
-    click.echo(table)
+    table.close()
 
 def moderator_sort(sort):
     """
@@ -65,6 +321,7 @@ def moderator_sort(sort):
 @click.option("--data", is_flag=True,
     help="Print moderator in JSON format.")
 @click.option("--account", "-a", multiple=True,
+    shell_complete=complete("moderators"),
     help="Specific moderator account.")
 @click.option("--reviewed",
     default=0,
@@ -80,7 +337,7 @@ def moderators(supervisor, reviewed, data, account, moderator, sort):
     """
     sort_by = moderator_sort(sort)
     accounts = []
-    response = requests.get("{}moderators".format(UTOPIAN_API)).json()
+    response = get_json("{}moderators".format(UTOPIAN_API))
     for moderator in response["results"]:
         if moderator["total_moderated"] > reviewed:
             if account:
@@ -97,27 +354,31 @@ def moderators(supervisor, reviewed, data, account, moderator, sort):
                 accounts.append(moderator)
 
     if data:
-        click.echo(json.dumps(accounts, indent=4, sort_keys=True))
+        moderators_table(accounts, sort_by, "json")
     else:
         moderators_table(accounts, sort_by)
 
-def sponsors_table(sponsors, sort_by):
+def sponsors_table(sponsors, sort_by, output_format=None):
     """
     Creates and prints the sponsor table.
     """
-    table = PrettyTable(["ID", "Sponsor", "Witness", "%", "Shares"])
+    table = RowWriter(["ID", "Sponsor", "Witness", "%", "Shares"],
+        output_format)
 
     for sponsor in sorted(sponsors, key=lambda x: x[sort_by], reverse=True):
         table.add_row([sponsor["_id"], sponsor["account"],
             sponsor["is_witness"],
             "{:.2f}%".format(sponsor["percentage_total_vesting_shares"]),
+            sponsor["vesting_shares"]], sponsor, [sponsor["_id"],
+            sponsor["account"], sponsor["is_witness"],
+            sponsor["percentage_total_vesting_shares"],
             sponsor["vesting_shares"]])
     
     table.align["Sponsor"] = "l"
     table.align["Witness"] = "l"
     table.align["%"] = "r"
     table.align["Shares"] = "r"
-    click.echo(table)
+    table.close()
 
 def sponsor_sort(sort):
     """
@@ -138,6 +399,7 @@ def sponsor_sort(sort):
 @click.option("--data", is_flag=True,
     help="Print sponsor in JSON format.")
 @click.option("--account", "-a", multiple=True,
+    shell_complete=complete("sponsors"),
     help="Sponsor's account name.")
 @click.option("--witness", is_flag=True,
     help="Sort sponsors by sponsors that are witnesses.")
@@ -152,7 +414,7 @@ def sponsors(data, account, witness, not_witness, sort):
     """
     sort_by = sponsor_sort(sort)
     accounts = []
-    response = requests.get("{}sponsors".format(UTOPIAN_API)).json()
+    response = get_json("{}sponsors".format(UTOPIAN_API))
     for sponsor in response["results"]:
         if account:
             if sponsor["account"] in account:
@@ -166,18 +428,15 @@ def sponsors(data, account, witness, not_witness, sort):
         else:
             accounts.append(sponsor)
     if data:
-        click.echo(json.dumps(accounts, indent=4, sort_keys=True))
+        sponsors_table(accounts, sort_by, "json")
     else:
         sponsors_table(accounts, sort_by)
 
-def query_string(limit, skip, category, author, post_filter, status,
-    similarity):
+def query_parameters(category, author, post_filter, status, similarity):
     """
-    Returns a query string created from the given query parameters.
+    Returns the query parameters used to filter contributions by the API.
     """
     parameters = {
-        "limit" : limit,
-        "skip" : skip,
         "section" : "all",
         "type" : category,
         "filterBy" : post_filter,
@@ -188,39 +447,158 @@ def query_string(limit, skip, category, author, post_filter, status,
         parameters["section"] = "author"
     if not similarity == None:
         parameters["bySimilarity"] = similarity
-    return urlencode(parameters)
+    return parameters
 
 def build_url(api, query_parameters=None):
     URL = "{}{}/?{}".format(UTOPIAN_API, api, urlencode(query_parameters))
     return URL
 
+def daemon_running():
+    """
+    Checks (once per process) if `utopian serve` is running locally, and not
+    just any other program listening on its port.
+    """
+    global use_daemon
+    if use_daemon is None:
+        try:
+            response = requests.get(DAEMON_URL + "_utopian", timeout=0.5)
+            use_daemon = response.json().get("daemon") == DAEMON_NAME
+        except (requests.RequestException, ValueError, AttributeError):
+            use_daemon = False
+    return use_daemon
+
+def fetch_json(url):
+    """
+    Returns the JSON response of the given URL. Requests to the Utopian.io API
+    are answered by the daemon instead when it is running.
+    """
+    if url.startswith(UTOPIAN_API) and daemon_running():
+        try:
+            response = requests.get(DAEMON_URL + url[len(UTOPIAN_API):],
+                timeout=DAEMON_TIMEOUT)
+            if response.ok:
+                return response.json()
+        except (requests.RequestException, ValueError):
+            # Fall back to the API when the daemon is stuck or has gone away
+            pass
+    return requests.get(url).json()
+
+def reusable(url):
+    """
+    Checks if the response of the given URL is small enough to keep for the
+    life of the process. Pages of posts are only kept when they are used to
+    count the posts (limit=1).
+    """
+    url = urlsplit(url)
+    if not url.path.rstrip("/").endswith("posts"):
+        return True
+    return dict(parse_qsl(url.query)).get("limit") == "1"
+
+def get_json(url):
+    """
+    Returns the JSON response of the given URL. Threads requesting a URL that
+    is already being requested wait for that response instead of making the
+    same request again, and small responses are reused afterwards.
+    """
+    if not cache_responses:
+        return fetch_json(url)
+    with json_responses_lock:
+        response = json_responses.get(url)
+        requesting = response is None
+        if requesting:
+            response = json_responses[url] = {"done" : threading.Event()}
+    if not requesting:
+        response["done"].wait()
+        if "error" in response:
+            raise response["error"]
+        return response["result"]
+
+    try:
+        response["result"] = fetch_json(url)
+    except Exception as error:
+        # Don't cache failures, the next request tries again
+        response["error"] = error
+        raise
+    finally:
+        # Threads that are already waiting still get the response
+        if "error" in response or not reusable(url):
+            with json_responses_lock:
+                del json_responses[url]
+        response["done"].set()
+    return response["result"]
+
+def prefetch(function, items):
+    """
+    Yields the result of calling the given function on each item, in order.
+    The results of the next few items are already retrieved in the background
+    while the current one is being used.
+    """
+    pool = ThreadPool(PREFETCH_WINDOW)
+    try:
+        for result in pool.imap(function, items):
+            yield result
+    finally:
+        pool.terminate()
+
+def unique_contributions(contributions):
+    """
+    Removes duplicate contributions (by author and permlink) from the given
+    contributions.
+    """
+    seen = set()
+    unique = []
+    for contribution in contributions:
+        key = (contribution["author"], contribution["permlink"])
+        if not key in seen:
+            seen.add(key)
+            unique.append(contribution)
+    return unique
+
+def page_posts(query_parameters, limit=None, page_size=1000):
+    """
+    Yields all posts matching the given query parameters, retrieving them
+    page by page until the limit (or the total amount of posts) is reached.
+    """
+    query_parameters = dict(query_parameters)
+    skip = 0
+    while limit is None or skip < limit:
+        query_parameters["skip"] = skip
+        if limit is None:
+            query_parameters["limit"] = page_size
+        else:
+            query_parameters["limit"] = min(page_size, limit - skip)
+        response = get_json(build_url("posts", query_parameters))
+        for post in response["results"]:
+            yield post
+        skip += len(response["results"])
+        if not response["results"] or skip >= response["total"]:
+            break
+
+def timestamp(date):
+    """
+    Converts the given date (or date string) to seconds since the epoch.
+    """
+    if not isinstance(date, datetime.datetime):
+        date = parse(date)
+    return (date.replace(tzinfo=None) - EPOCH).total_seconds()
+
+def contribution_reward(contribution):
+    """
+    Returns the (rounded) reward of the given contribution in dollars.
+    """
+    reward = round(float(contribution["pending_payout_value"].split(" ")[0]))
+    if reward == 0:
+        author = float(contribution["total_payout_value"].split(" ")[0])
+        curator = float(contribution["curator_payout_value"].split(" ")[0])
+        reward = round(author + curator)
+    return int(reward)
+
 def build_response(limit, category, author, post_filter, status, similarity):
     """
     Returns all contributions that match the given parameters.
     """
-    skip = 0
-    if limit < 1000:
-        query = query_string(limit, skip, category, author, post_filter, status,
-            similarity)
-        responses = requests.get("{}posts/?{}".format(UTOPIAN_API,
-            query)).json()["results"]
-    else:
-        responses = []
-        while skip < limit:
-            if limit - skip < 1000:
-                remainder = limit - skip
-                query = query_string(remainder, skip, category, author,
-                    post_filter)
-            else:
-                query = query_string(1000, skip, category, author, post_filter,
-                    status, similarity)
-            response = requests.get("{}posts/?{}".format(UTOPIAN_API,
-                query)).json()
-            if response["total"] < limit:
-                limit = response["total"]
-            responses.extend(response["results"])
-            skip += 1000
-    return responses
+    return list(page_posts(query_parameters(category, author, post_filter,
+        status, similarity), limit))
 
 @cli.command()
 @click.option("--category",
@@ -251,24 +629,41 @@ def build_response(limit, category, author, post_filter, status, similarity):
     help="Status to filter contributions by.")
 @click.option("--similarity", "-si",
     help="Filter contributions by similar title and body.")
+@click.option("--matches", "-m", type=int,
+    help="Retrieve contributions until N of them match the tags and title.")
 def contributions(category, limit, tags, author, filter_by, title, status,
-    similarity):
+    similarity, matches):
     """
     Get information about all contributions made to Utopian.io.
     """
-    contributions = build_response(limit, category, author, filter_by, status,
-        similarity)
+    if matches:
+        # Pages are filtered as they arrive, so stop as soon as there are
+        # enough matches instead of guessing a limit
+        contributions = page_posts(query_parameters(category, author,
+            filter_by, status, similarity),
+            page_size=min(1000, max(100, matches)))
+    else:
+        contributions = build_response(limit, category, author, filter_by,
+            status, similarity)
     if tags == "utopian-io":
         tags = tags.split()
     else:
         tags = tags.split(",")
 
+    output_format = get_output_format()
+    output = RowWriter(["URL", "Author", "Permlink", "Title", "Category"],
+        "lines" if output_format == "table" else output_format)
     for contribution in contributions:
         if (not set(tags).isdisjoint(contribution["json_metadata"]["tags"])
             and title in contribution["title"]):
             author = contribution["author"]
             permlink = contribution["permlink"]
-            click.echo(BASE_URL.format(author, permlink))
+            output.add_row([BASE_URL.format(author, permlink), author,
+                permlink, contribution["title"],
+                contribution["json_metadata"]["type"]])
+            if matches and output.rows >= matches:
+                break
+    output.close()
 
 @cli.command()
 @click.option("--category", "-c", default="blog", help="Contribution category.",
@@ -279,7 +674,7 @@ def stats(category):
     """
     Returns statistics about the given category in JSON format.
     """
-    response = requests.get("{}/stats".format(UTOPIAN_API)).json()["stats"]
+    response = get_json("{}/stats".format(UTOPIAN_API))["stats"]
     if category:
         for c in response["categories"]:
             if category == c:
@@ -304,14 +699,14 @@ def is_moderator(account):
     """
     Function that checks if the given account(s) are moderators or not.
     """
-    moderators = requests.get("{}moderators".format(UTOPIAN_API)).json()
+    moderators = get_json("{}moderators".format(UTOPIAN_API))
     return set(account).issubset([m["account"] for m in moderators["results"]])
 
 def is_supervisor(account):
     """
     Function that checks if the given account(s) are supervisors or not.
     """
-    moderators = requests.get("{}moderators".format(UTOPIAN_API)).json()
+    moderators = get_json("{}moderators".format(UTOPIAN_API))
     return set(account).issubset([m["account"] for m in moderators["results"]
         if not "referrer" in m.keys()])
 
@@ -383,13 +778,7 @@ def contributor_dictionary(response, date):
         if date < parse(contribution["created"]):
             moderator = contribution["moderator"]
             category = contribution["json_metadata"]["type"]
-            reward = round(
-                float(contribution["pending_payout_value"].split(" ")[0]))
-            if reward == 0:
-                author = float(contribution["total_payout_value"].split(" ")[0])
-                curator = float(
-                    contribution["curator_payout_value"].split(" ")[0])
-                reward = round(author + curator)
+            reward = contribution_reward(contribution)
             contributed_categories.setdefault(category, {
                     "accepted" : 0,
                     "rejected" : 0,
@@ -448,7 +837,29 @@ def moderator_dictionary(response, date):
             authors[author]["total"] += 1
     return reviewed_categories, authors
 
-def moderator_table(reviewed_categories):
+def table_fields(column, details, account_type):
+    """
+    Returns the columns of the table built by build_table().
+    """
+    if details:
+        return [column, "Reviewed", "Accepted", "Rejected", "%"]
+    elif account_type == "contributor":
+        return ["Category", "Contributed", "Accepted", "Rejected", "%",
+            "Reward"]
+    else:
+        return ["Category", "Reviewed", "Accepted", "Rejected", "%", "Points"]
+
+def table_writer(fields, label, table):
+    """
+    Returns the given (shared) table for the given label, or a new table if
+    there is none.
+    """
+    if table is None:
+        return RowWriter(fields, label=label)
+    table.label = label
+    return table
+
+def moderator_table(reviewed_categories, label=None, table=None):
     """
     Function used to create a table showing the performance of a user as a 
     moderator.
@@ -456,28 +867,30 @@ def moderator_table(reviewed_categories):
     total_points = 0
     total_accepted = 0
     total_rejected = 0
-    table = PrettyTable(["Category", "Reviewed", "Accepted", "Rejected", "%",
-        "Points"])
+    table = table_writer(table_fields("Category", False, "moderator"), label,
+        table)
 
     for key, value in reviewed_categories.items():
         reviewed = value["total"]
         accepted = value["accepted"]
         rejected = value["rejected"]
-        accepted_pct = "{}%".format(percentage(accepted, rejected))
+        accepted_pct = percentage(accepted, rejected)
         points = category_points(key, reviewed)
-        table.add_row([key, reviewed, accepted, rejected, accepted_pct, points])
+        table.add_row([key, reviewed, accepted, rejected,
+            "{}%".format(accepted_pct), points], values=[key, reviewed,
+            accepted, rejected, accepted_pct, points])
         total_points += points
         total_accepted += accepted
         total_rejected += rejected
 
     accepted_pct = "{}%".format(percentage(total_accepted, total_rejected))
-    table.add_row(["all", total_accepted + total_rejected, total_accepted,
+    table.add_total(["all", total_accepted + total_rejected, total_accepted,
         total_rejected, accepted_pct, total_points])
     table.align = "r"
     table.align["Category"] = "l"
     return table
 
-def contributor_table(contributed_categories):
+def contributor_table(contributed_categories, label=None, table=None):
     """
     Function used to create a table showing the performance of a user as a 
     contributor.
@@ -485,52 +898,54 @@ def contributor_table(contributed_categories):
     total_accepted = 0
     total_reward = 0
     total_rejected = 0
-    table = PrettyTable(["Category", "Contributed", "Accepted", "Rejected", "%",
-        "Reward"])
+    table = table_writer(table_fields("Category", False, "contributor"), label,
+        table)
 
     for key, value in contributed_categories.items():
         reviewed = value["total"]
         accepted = value["accepted"]
         reward = value["reward"]
         rejected = value["rejected"]
-        accepted_pct = "{}%".format(percentage(accepted, rejected))
-        post_reward = "{}$".format(reward)
+        accepted_pct = percentage(accepted, rejected)
 
-        table.add_row([key, reviewed, accepted, rejected, accepted_pct,
-            post_reward])
+        table.add_row([key, reviewed, accepted, rejected,
+            "{}%".format(accepted_pct), "{}$".format(reward)], values=[key,
+            reviewed, accepted, rejected, accepted_pct, reward])
         total_accepted += accepted
         total_reward += reward
         total_rejected += rejected
 
     accepted_pct = "{}%".format(percentage(total_accepted, total_rejected))
     total_reward = "{}$".format(total_reward)
-    table.add_row(["all", total_accepted + total_rejected, total_accepted,
+    table.add_total(["all", total_accepted + total_rejected, total_accepted,
         total_rejected, accepted_pct, total_reward])
 
     table.align = "r"
     table.align["Category"] = "l"
     return table
 
-def details_table(users, limit, sort, column):
+def details_table(users, limit, sort, column, label=None, table=None):
     """
     Function used to create the details table for a specific command.
     """
     total_accepted = 0
     total_rejected = 0
 
-    table = PrettyTable([column, "Reviewed", "Accepted", "Rejected", "%"])
+    table = table_writer(table_fields(column, True, None), label, table)
     for key, value in sorted(users.items(), key=lambda x: x[1][sort],
         reverse=True)[:limit]:
         accepted = value["accepted"]
         rejected = value["rejected"]
         reviewed = accepted + rejected
-        accepted_pct = "{}%".format(percentage(accepted, rejected))
-        table.add_row([key, reviewed, accepted, rejected, accepted_pct])
+        accepted_pct = percentage(accepted, rejected)
+        table.add_row([key, reviewed, accepted, rejected,
+            "{}%".format(accepted_pct)], values=[key, reviewed, accepted,
+            rejected, accepted_pct])
         total_accepted += accepted
         total_rejected += rejected
 
     accepted_pct = "{}%".format(percentage(total_accepted, total_rejected))
-    table.add_row(["all", total_accepted + total_rejected, total_accepted,
+    table.add_total(["all", total_accepted + total_rejected, total_accepted,
         total_rejected, accepted_pct])
 
     table.align = "r"
@@ -581,7 +996,7 @@ def supervisor_team(account):
     Returns a tuple of the accounts in a supervisor's team.
     """
     accounts = []
-    response = requests.get("{}moderators".format(UTOPIAN_API)).json()
+    response = get_json("{}moderators".format(UTOPIAN_API))
     for moderator in response["results"]:
         if "referrer" in moderator.keys():
             if moderator["referrer"] in account:
@@ -589,22 +1004,56 @@ def supervisor_team(account):
     return tuple(accounts)
 
 def build_table(categories, authors, limit, sort, column, details,
-    account_type):
+    account_type, label=None, table=None):
     """
-    Builds a table used in some of the commands.
+    Builds a table used in some of the commands. If a label is given it is
+    printed above the table, or added as a column for the other formats. The
+    rows are added to the given table if there is one, which the caller has
+    to close.
     """
+    if label is not None and get_output_format() == "table":
+        click.echo("\n{}".format(label))
     if not details:
         if account_type == "contributor":
-            table = contributor_table(categories)
+            output = contributor_table(categories, label, table)
         else:
-            table = moderator_table(categories)
+            output = moderator_table(categories, label, table)
     else:
-        table = details_table(authors, limit, sort, column)
+        output = details_table(authors, limit, sort, column, label, table)
+
+    if table is None:
+        output.close()
+
+def moderator_contributions(user):
+    """
+    Returns all contributions reviewed by the given moderator.
+    """
+    total = get_json(build_url("posts",
+        {"moderator" : user, "limit" : 1}))["total"]
+    return get_json(build_url("posts", {"moderator" : user,
+        "limit" : total}))["results"]
 
-    click.echo(table)
+def author_contributions(author):
+    """
+    Returns all (accepted and rejected) contributions made by the given
+    author.
+    """
+    total_accepted = get_json(build_url("posts", 
+        {"section" : "author", "limit" : 1, "author" : author}
+        ))["total"]
+    accepted = get_json(build_url("posts", {"section" : "author", 
+        "limit" : total_accepted, "author" : author}))["results"]
+    total_rejected = get_json(build_url("posts", 
+        {"section" : "author", "limit" : 1, "author" : author, 
+        "status" : "flagged"}))["total"]
+    rejected = get_json(build_url("posts", {"section" : "author", 
+        "limit" : total_accepted, "author" : author, "status" : "flagged"}
+        ))["results"]
+    return unique_contributions(rejected + accepted)
 
 @cli.command()
-@click.option("--account", "-a", type=str, multiple=True, required=True)
+@click.option("--account", "-a", type=str, multiple=True, required=True,
+    shell_complete=complete("moderators"))
 @click.option("--date", type=DATE,
     help="See performance for the time period [NOW] - [DATE]")
 @click.option("--days", type=int,
@@ -625,8 +1074,10 @@ def build_table(categories, authors, limit, sort, column, details,
     help="Value to sort the table by.",
     type=click.Choice(["total", "accepted", "rejected"]))
 @click.option("--individual", "-i", is_flag=True, default=False)
+@click.option("--snapshot", type=click.Path(exists=True, dir_okay=False),
+    help="Read contributions from a snapshot instead of the API.")
 def performance(account_type, account, date, days, details, individual, limit,
-    sort):
+    sort, snapshot):
     """
     Takes a given account and either shows the account's performance as a 
     contributor or as a moderator (if applicable) in a given time period.
@@ -634,6 +1085,8 @@ def performance(account_type, account, date, days, details, individual, limit,
     date = date_validator(date, days)
     if not date:
         return
+    if snapshot:
+        snapshot = load_snapshot(snapshot)
 
     if account_type == "moderator" and not is_moderator(account):
         if len(account) == 1:
@@ -653,51 +1106,55 @@ def performance(account_type, account, date, days, details, individual, limit,
             account = supervisor_team(account)
         responses = []
         if individual:
-            if account_type == "supervisor":
+            if (account_type == "supervisor" and
+                get_output_format() == "table"):
                 click.echo("OVERVIEW OF {}'S TEAM ({} MODERATORS)".format(
                     supervisor[0].upper(), len(account)))
+            # Tables are printed per user, the other formats are written as a
+            # single document with an Account column
+            table = None
+            if get_output_format() != "table":
+                table = RowWriter(table_fields("Author", details,
+                    account_type), label="")
+            if not snapshot:
+                fetched = prefetch(moderator_contributions, account)
             for user in account:
-                total = requests.get(build_url("posts",
-                    {"moderator" : user, "limit" : 1})).json()["total"]
-                response = requests.get(build_url("posts", {"moderator" : user,
-                    "limit" : total})).json()["results"]
-                r_cats, authors = moderator_dictionary(response, date)
-                click.echo("\n{}".format(user))
+                if snapshot:
+                    r_cats, authors = snapshot.moderator_dictionary([user],
+                        date)
+                else:
+                    r_cats, authors = moderator_dictionary(next(fetched), date)
                 build_table(r_cats, authors, limit, sort, "Author", details,
-                    account_type)
+                    account_type, user, table)
+            if table is not None:
+                table.close()
+            return
+        elif snapshot:
+            r_cats, authors = snapshot.moderator_dictionary(account, date)
+            build_table(r_cats, authors, limit, sort, "Author", details,
+                account_type)
             return
         else:
-            with click.progressbar(account) as bar:
-                for user in bar:
-                    total = requests.get(build_url("posts", {
-                        "moderator" : user, "limit" : 1})).json()["total"]
-                    response = requests.get(build_url("posts", {
-                        "moderator" : user, "limit" : total})).json()["results"]
-                    # print(json.dumps(response))
+            with click.progressbar(prefetch(moderator_contributions, account),
+                length=len(account),
+                file=click.get_text_stream("stderr")) as bar:
+                for response in bar:
                     responses.extend(response)
                     
         # Loop over all reviewed contributions and build dictionary
-        r_cats, authors = moderator_dictionary(responses, date)
+        r_cats, authors = moderator_dictionary(
+            unique_contributions(responses), date)
         build_table(r_cats, authors, limit, sort, "Author", details,
             account_type)
     elif account_type == "contributor":
-        responses = []
-        for a in account:
-            total_accepted = requests.get(build_url("posts", 
-                {"section" : "author", "limit" : 1, "author" : a}
-                )).json()["total"]
-            accepted = requests.get(build_url("posts", {"section" : "author", 
-                "limit" : total_accepted, "author" : a})).json()["results"]
-            total_rejected = requests.get(build_url("posts", 
-                {"section" : "author", "limit" : 1, "author" : a, 
-                "status" : "flagged"})).json()["total"]
-            rejected = requests.get(build_url("posts", {"section" : "author", 
-                "limit" : total_accepted, "author" : a, "status" : "flagged"}
-                )).json()["results"]
-            responses.extend(rejected)
-            responses.extend(accepted)
-        
-        c_cats, moderators = contributor_dictionary(responses, date)
+        if snapshot:
+            c_cats, moderators = snapshot.contributor_dictionary(account, date)
+        else:
+            responses = []
+            for a in account:
+                responses.extend(author_contributions(a))
+            c_cats, moderators = contributor_dictionary(
+                unique_contributions(responses), date)
         build_table(c_cats, moderators, limit, sort, "Moderator", details,
             account_type)
 
@@ -714,14 +1171,7 @@ def project_dictionary(contributions, date):
         if date < parse(contribution["created"]):
             author = contribution["author"]
             category = contribution["json_metadata"]["type"]
-            reward = round(
-                float(contribution["pending_payout_value"].split(" ")[0]))
-            if reward == 0:
-                author_reward = float(
-                    contribution["total_payout_value"].split(" ")[0])
-                curator_reward = float(
-                    contribution["curator_payout_value"].split(" ")[0])
-                reward = round(author_reward + curator_reward)
+            reward = contribution_reward(contribution)
             reviewed_categories.setdefault(category, {
                     "accepted" : 0,
                     "rejected" : 0,
@@ -746,7 +1196,8 @@ def project_dictionary(contributions, date):
     return reviewed_categories, authors
 
 @cli.command()
-@click.argument("repository",type=str)
+@click.argument("repository",type=str,
+    shell_complete=complete("repositories"))
 @click.option("--date",
     type=DATE,
     help="See performance for the time period [NOW] - [DATE]")
@@ -771,7 +1222,10 @@ def project_dictionary(contributions, date):
     "sub-projects", "development", "bug-hunting", "translations", "graphics",
     "analysis", "social", "documentation", "tutorials", "video-tutorials",
     "copywriting"]), multiple=True)
-def project(author, category, date, days, details, limit, repository, sort):
+@click.option("--snapshot", type=click.Path(exists=True, dir_okay=False),
+    help="Read contributions from a snapshot instead of the API.")
+def project(author, category, date, days, details, limit, repository, sort,
+    snapshot):
     """
     Get information about the contributions made to a specific project on
     GitHub.
@@ -779,12 +1233,21 @@ def project(author, category, date, days, details, limit, repository, sort):
     date = date_validator(date, days)
     if not date:
         return
-    response = requests.get("{}repos/{}".format(GITHUB_API, repository)).json()
+    response = get_json("{}repos/{}".format(GITHUB_API, repository))
     if "id" in response.keys():
         repository_id = response["id"]
     else:
         click.echo("Please enter a valid GitHub repository.")
         return
+    remember_repository(repository)
+
+    if snapshot:
+        snapshot = load_snapshot(snapshot)
+        p_cats, authors = snapshot.project_dictionary(repository_id, date,
+            author, category)
+        build_table(p_cats, authors, limit, sort, "Author", details,
+            "contributor")
+        return
 
     query_parameters = {
         "section" : "project",
@@ -796,12 +1259,12 @@ def project(author, category, date, days, details, limit, repository, sort):
     all_contributions = []
 
     # Get total accepted contributions made to the project
-    total_accepted = requests.get(build_url("posts",
-        query_parameters)).json()["total"]
+    total_accepted = get_json(build_url("posts",
+        query_parameters))["total"]
     query_parameters["status"] = "flagged"
     # Get total rejected contributions made to the project
-    total_rejected = requests.get(build_url("posts",
-        query_parameters)).json()["total"]
+    total_rejected = get_json(build_url("posts",
+        query_parameters))["total"]
 
     if total_accepted + total_rejected == 0:
         click.echo("No contributions have been made to this project...")
@@ -810,18 +1273,19 @@ def project(author, category, date, days, details, limit, repository, sort):
         if total_rejected > 0:
             # Change limit parameter and retrieve all rejected contributions
             query_parameters["limit"] = total_rejected
-            rejected = requests.get(build_url("posts",
-                query_parameters)).json()["results"]
+            rejected = get_json(build_url("posts",
+                query_parameters))["results"]
             all_contributions.extend(rejected)
         if total_accepted > 0:
             # Change limit and status parameters and retrieve all accepted
             # contributions
             query_parameters["limit"] = total_accepted
             query_parameters["status"] = "any"
-            accepted = requests.get(build_url("posts",
-                query_parameters)).json()["results"]
+            accepted = get_json(build_url("posts",
+                query_parameters))["results"]
             all_contributions.extend(accepted)
         
+        all_contributions = unique_contributions(all_contributions)
         # Filter by author or filter by category
         if author:
             all_contributions = filter_by_author(all_contributions, author)
@@ -829,7 +1293,725 @@ def project(author, category, date, days, details, limit, repository, sort):
             all_contributions = filter_by_category(all_contributions, category)
 
         p_cats, authors = project_dictionary(all_contributions, date)
-        table = build_table(p_cats, authors, limit, sort, "Author", details,
+        build_table(p_cats, authors, limit, sort, "Author", details,
             "contributor")
-        
-        click.echo(table)
\ No newline at end of file
+
+def snapshot_row(contribution, dictionaries):
+    """
+    Converts a contribution to a row of the snapshot's columns, adding any new
+    authors, moderators and categories to the given dictionaries.
+    """
+    metadata = contribution["json_metadata"]
+    moderation = metadata.get("moderator") or {}
+    moderated = moderation.get("time", contribution["created"])
+    project_id = (metadata.get("repository") or {}).get("id") or 0
+    row = {
+        "created" : int(timestamp(contribution["created"])),
+        "moderated" : int(timestamp(moderated)),
+        "reward" : contribution_reward(contribution),
+        "project" : int(project_id),
+        "flagged" : 1 if contribution.get("flagged") else 0
+    }
+    for column, value in [("author", contribution["author"]),
+        ("moderator", contribution.get("moderator") or ""),
+        ("category", metadata.get("type") or "")]:
+        ids = dictionaries[column]
+        row[column] = ids.setdefault(value, len(ids))
+    return row
+
+def write_snapshot(path, contributions):
+    """
+    Writes the given contributions to a columnar snapshot file. Each column is
+    stored as a fixed-width array, authors, moderators and categories are
+    dictionary encoded. Returns the amount of rows written.
+    """
+    # Index 0 is reserved for contributions without a moderator or category
+    dictionaries = {
+        "author" : {},
+        "moderator" : {"" : 0},
+        "category" : {"" : 0}
+    }
+    columns = dict((name, array.array(code))
+        for name, code in SNAPSHOT_COLUMNS)
+    seen = set()
+    for contribution in contributions:
+        key = (contribution["author"], contribution["permlink"])
+        if key in seen:
+            continue
+        seen.add(key)
+        row = snapshot_row(contribution, dictionaries)
+        for name, _ in SNAPSHOT_COLUMNS:
+            columns[name].append(row[name])
+
+    header = {"byteorder" : sys.byteorder}
+    for column, ids in dictionaries.items():
+        header[column] = sorted(ids, key=ids.get)
+    header = json.dumps(header).encode("utf-8")
+    header += b" " * (-len(header) % 8)
+
+    with open(path, "wb") as snapshot:
+        snapshot.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, len(seen),
+            len(header)))
+        snapshot.write(header)
+        for name, _ in SNAPSHOT_COLUMNS:
+            snapshot.write(columns[name].tobytes())
+    return len(seen)
+
+class Snapshot(object):
+    """
+    A read-only view of a snapshot file. The columns are memory-mapped, so
+    they are scanned straight from the page cache without building any
+    dictionaries per contribution.
+    """
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.rows, length = SNAPSHOT_HEADER.unpack_from(self._map)
+        if magic != SNAPSHOT_MAGIC:
+            raise click.ClickException("{} is not a snapshot.".format(path))
+        offset = SNAPSHOT_HEADER.size
+        header = json.loads(self._map[offset:offset + length].decode("utf-8"))
+        if header["byteorder"] != sys.byteorder:
+            raise click.ClickException(
+                "{} was written on a machine with a different byte order."
+                .format(path))
+        self.dictionaries = dict((column, header[column])
+            for column in ["author", "moderator", "category"])
+
+        self._view = memoryview(self._map)
+        self.columns = {}
+        offset += length
+        for name, code in SNAPSHOT_COLUMNS:
+            size = self.rows * array.array(code).itemsize
+            self.columns[name] = self._view[offset:offset + size].cast(code)
+            offset += size
+
+    def close(self):
+        """
+        Releases the column views and unmaps the file. If arrays still view
+        the columns (e.g. while an error is raised) the file is unmapped once
+        they are garbage collected instead.
+        """
+        try:
+            for column in self.columns.values():
+                column.release()
+            self._view.release()
+            self._map.close()
+        except BufferError:
+            pass
+        self.columns = {}
+        self._file.close()
+
+    def ids(self, column, values):
+        """
+        Returns the dictionary ids of the given values in the given column.
+        """
+        return set(index for index, value
+            in enumerate(self.dictionaries[column]) if value in values)
+
+    def rows_where(self, column, ids):
+        """
+        Returns the indices of the rows whose value in the given column is one
+        of the given ids.
+        """
+        return [row for row, value in enumerate(self.columns[column])
+            if value in ids]
+
+    def aggregate(self, rows, group, detail, since, time_column, reward):
+        """
+        Counts the accepted and rejected contributions of the given rows that
+        were created (or moderated) after the given date, per category and
+        per value of the given detail column.
+        """
+        since = timestamp(since)
+        times = self.columns[time_column]
+        flagged = self.columns["flagged"]
+        rewards = self.columns["reward"]
+        groups = self.columns[group]
+        details = self.columns[detail]
+        group_names = self.dictionaries[group]
+        detail_names = self.dictionaries[detail]
+
+        categories = {}
+        users = {}
+        for row in rows:
+            if not since < times[row]:
+                continue
+            category = categories.setdefault(group_names[groups[row]],
+                {"accepted" : 0, "rejected" : 0, "total" : 0})
+            user = users.setdefault(detail_names[details[row]],
+                {"accepted" : 0, "rejected" : 0, "total" : 0})
+            status = "rejected" if flagged[row] else "accepted"
+            category[status] += 1
+            category["total"] += 1
+            user[status] += 1
+            user["total"] += 1
+            if reward:
+                category["reward"] = category.get("reward", 0) + rewards[row]
+        return categories, users
+
+    def moderator_dictionary(self, accounts, date):
+        """
+        Snapshot equivalent of moderator_dictionary() for the given moderators.
+        """
+        rows = self.rows_where("moderator", self.ids("moderator", accounts))
+        return self.aggregate(rows, "category", "author", date, "moderated",
+            False)
+
+    def contributor_dictionary(self, accounts, date):
+        """
+        Snapshot equivalent of contributor_dictionary() for the given authors.
+        """
+        moderators = self.columns["moderator"]
+        rows = [row for row in self.rows_where("author",
+            self.ids("author", accounts)) if moderators[row]]
+        return self.aggregate(rows, "category", "moderator", date, "created",
+            True)
+
+    def project_dictionary(self, project_id, date, authors=None,
+        categories=None):
+        """
+        Snapshot equivalent of project_dictionary() for the given project,
+        optionally filtered by the given authors and categories.
+        """
+        projects = self.columns["project"]
+        moderators = self.columns["moderator"]
+        rows = [row for row, value in enumerate(projects)
+            if value == project_id and moderators[row]]
+        if authors:
+            author_ids = self.ids("author", authors)
+            rows = [row for row in rows
+                if self.columns["author"][row] in author_ids]
+        if categories:
+            category_ids = self.ids("category", categories)
+            rows = [row for row in rows
+                if self.columns["category"][row] in category_ids]
+        return self.aggregate(rows, "category", "author", date, "created",
+            True)
+
+def load_snapshot(path):
+    """
+    Opens the snapshot at the given path and closes it once the current
+    command has finished.
+    """
+    snapshot = Snapshot(path)
+    click.get_current_context().call_on_close(snapshot.close)
+    return snapshot
+
+@cli.command()
+@click.argument("path", type=click.Path(dir_okay=False, writable=True))
+@click.option("--limit", type=int,
+    help="Limit the amount of accepted and rejected contributions to N each.")
+def snapshot(path, limit):
+    """
+    Downloads all contributions and saves them as a snapshot that can be used
+    by the performance and project commands.
+    """
+    def contributions():
+        for status in ["any", "flagged"]:
+            for contribution in page_posts({"section" : "all",
+                "status" : status}, limit):
+                yield contribution
+
+    rows = write_snapshot(path, contributions())
+    click.echo("Saved {} contributions to {}.".format(rows, path))
+
+TREND_COLUMNS = {
+    "category" : ("category", "created", "Category"),
+    "moderator" : ("moderator", "moderated", "Moderator"),
+    "author" : ("author", "created", "Author"),
+    "project" : ("project", "created", "Project")
+}
+
+def moving_average(series, window):
+    """
+    Returns the trailing moving average over the given amount of intervals
+    for each row of the given series.
+    """
+    import numpy
+    totals = numpy.cumsum(series, axis=1, dtype=float)
+    totals = numpy.concatenate([numpy.zeros((len(series), 1)), totals], axis=1)
+    end = numpy.arange(1, series.shape[1] + 1)
+    start = numpy.maximum(end - window, 0)
+    return (totals[:, end] - totals[:, start]) / (end - start)
+
+def trend_series(snapshot, group_by, interval, since, values=None):
+    """
+    Bins the reviewed contributions in the snapshot per group and interval in
+    a single pass. Returns the groups, the start of each interval and arrays
+    with the accepted, rejected and reward per group and interval.
+    """
+    import numpy
+    group_column, time_column, _ = TREND_COLUMNS[group_by]
+    times = numpy.asarray(snapshot.columns[time_column])
+    groups = numpy.asarray(snapshot.columns[group_column])
+    mask = ((numpy.asarray(snapshot.columns["moderator"]) != 0) &
+        (times > timestamp(since)))
+    if values:
+        if group_by == "project":
+            ids = [int(value) for value in values]
+        else:
+            ids = list(snapshot.ids(group_column, values))
+        mask &= numpy.isin(groups, ids)
+
+    # Copy what is needed out of the snapshot, arrays viewing its columns
+    # would keep it from being closed
+    days = times[mask] // 86400
+    groups = groups[mask]
+    flagged = numpy.asarray(snapshot.columns["flagged"])[mask].astype(bool)
+    rewards = numpy.asarray(snapshot.columns["reward"])[mask]
+    del times, mask
+    if interval == "day":
+        bins = days
+    elif interval == "week":
+        # Weeks start on monday, the epoch was a thursday
+        bins = (days + 3) // 7
+    else:
+        bins = days.astype("datetime64[D]").astype("datetime64[M]").astype(
+            numpy.int64)
+    if not len(bins):
+        empty = numpy.zeros((0, 0))
+        return [], [], empty, empty, empty
+
+    first = bins.min()
+    intervals = int(bins.max() - first + 1)
+    codes, group_index = numpy.unique(groups, return_inverse=True)
+    keys = group_index * intervals + (bins - first)
+    size = len(codes) * intervals
+
+    def count(weights=None):
+        return numpy.bincount(keys, weights, size).reshape(len(codes),
+            intervals)
+
+    rejected = count(flagged)
+    accepted = count(~flagged)
+    reward = count(rewards)
+
+    if interval == "day":
+        starts = numpy.arange(first, first + intervals).astype("datetime64[D]")
+    elif interval == "week":
+        starts = (numpy.arange(first, first + intervals) * 7 - 3).astype(
+            "datetime64[D]")
+    else:
+        starts = numpy.arange(first, first + intervals).astype(
+            "datetime64[M]")
+    if group_by == "project":
+        names = [int(code) for code in codes]
+    else:
+        names = [snapshot.dictionaries[group_column][code] for code in codes]
+    return names, [str(start) for start in starts], accepted, rejected, reward
+
+@cli.command()
+@click.argument("snapshot", type=click.Path(exists=True, dir_okay=False))
+@click.option("--by", "group_by", default="category",
+    type=click.Choice(["category", "moderator", "author", "project"]),
+    help="Value to group the contributions by.")
+@click.option("--interval", default="week",
+    type=click.Choice(["day", "week", "month"]),
+    help="Size of the intervals to bin the contributions in.")
+@click.option("--date", type=DATE,
+    help="See trends for the time period [NOW] - [DATE]")
+@click.option("--days", type=int,
+    help="See trends for the last N days.")
+@click.option("--value", "-v", "values", multiple=True,
+    help="Only show these categories, moderators, authors or projects.")
+@click.option("--moving-average", "-m", "window", default=0,
+    help="Add the moving average over the last N intervals.")
+def trends(snapshot, group_by, interval, date, days, values, window):
+    """
+    Shows the accepted and rejected contributions and their rewards per day,
+    week or month, grouped by category, moderator, author or project.
+    """
+    try:
+        import numpy
+    except ImportError:
+        raise click.ClickException(
+            "The trends command requires numpy: pip install utopian[trends]")
+    if group_by == "project":
+        for value in values:
+            if not value.isdigit():
+                raise click.BadParameter(
+                    "{} is not a project ID.".format(value),
+                    param_hint="--value")
+    if date or days:
+        date = date_validator(date, days)
+        if not date:
+            return
+    else:
+        date = EPOCH
+
+    snapshot = load_snapshot(snapshot)
+    names, starts, accepted, rejected, reward = trend_series(snapshot,
+        group_by, interval, date, values)
+    fields = ["Period", TREND_COLUMNS[group_by][2], "Accepted", "Rejected",
+        "Reward"]
+    if window > 1:
+        fields.extend(["Accepted (MA)", "Rejected (MA)", "Reward (MA)"])
+        averages = [moving_average(series, window)
+            for series in [accepted, rejected, reward]]
+
+    table = RowWriter(fields)
+    for group, name in enumerate(names):
+        for index, start in enumerate(starts):
+            values = [start, name, int(accepted[group, index]),
+                int(rejected[group, index]), int(reward[group, index])]
+            if window > 1:
+                values.extend([round(float(average[group, index]), 2)
+                    for average in averages])
+            row = values[:4] + ["{}$".format(values[4])]
+            row.extend(["{:.2f}".format(value) for value in values[5:]])
+            table.add_row(row, values=values)
+    table.align = "r"
+    table.align["Period"] = "l"
+    table.align[fields[1]] = "l"
+    table.close()
+
+EXPORT_FIELDS = ["author", "permlink", "moderator", "category", "flagged",
+    "created", "moderated", "pending_payout", "total_payout",
+    "curator_payout", "project_id", "tags"]
+
+def export_record(contribution):
+    """
+    Returns the fields of the given contribution that are exported.
+    """
+    metadata = contribution["json_metadata"]
+    moderation = metadata.get("moderator") or {}
+    project_id = (metadata.get("repository") or {}).get("id")
+    return {
+        "author" : contribution["author"],
+        "permlink" : contribution["permlink"],
+        "moderator" : contribution.get("moderator"),
+        "category" : metadata.get("type"),
+        "flagged" : bool(contribution.get("flagged")),
+        "created" : parse(contribution["created"]).replace(tzinfo=None),
+        "moderated" : parse(moderation["time"]).replace(tzinfo=None)
+            if "time" in moderation else None,
+        "pending_payout" : float(
+            contribution["pending_payout_value"].split(" ")[0]),
+        "total_payout" : float(
+            contribution["total_payout_value"].split(" ")[0]),
+        "curator_payout" : float(
+            contribution["curator_payout_value"].split(" ")[0]),
+        "project_id" : int(project_id) if project_id else None,
+        "tags" : list(metadata.get("tags") or [])
+    }
+
+def export_schema():
+    """
+    Returns the schema of exported Parquet and Arrow files, so files where a
+    column happens to be empty have the same schema as the others.
+    """
+    import pyarrow
+    types = {
+        "flagged" : pyarrow.bool_(),
+        "created" : pyarrow.timestamp("us"),
+        "moderated" : pyarrow.timestamp("us"),
+        "pending_payout" : pyarrow.float64(),
+        "total_payout" : pyarrow.float64(),
+        "curator_payout" : pyarrow.float64(),
+        "project_id" : pyarrow.int64(),
+        "tags" : pyarrow.list_(pyarrow.string())
+    }
+    return pyarrow.schema([(field, types.get(field, pyarrow.string()))
+        for field in EXPORT_FIELDS])
+
+def write_export(path, records, file_type):
+    """
+    Writes the given records to a Parquet, Arrow IPC or CSV file.
+    """
+    if file_type == "csv":
+        with open(path, "w") as export:
+            writer = csv.writer(export, lineterminator="\n")
+            writer.writerow(EXPORT_FIELDS)
+            for record in records:
+                row = [record[field] for field in EXPORT_FIELDS]
+                row[EXPORT_FIELDS.index("tags")] = ",".join(record["tags"])
+                writer.writerow(["" if value is None else value
+                    for value in row])
+        return
+
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+    schema = export_schema()
+    table = pyarrow.table(dict((field, [record[field] for record in records])
+        for field in EXPORT_FIELDS), schema=schema)
+    if file_type == "parquet":
+        pyarrow.parquet.write_table(table, path)
+    else:
+        with pyarrow.OSFile(path, "wb") as sink:
+            writer = pyarrow.ipc.new_file(sink, schema)
+            writer.write_table(table)
+            writer.close()
+
+@cli.command()
+@click.argument("path", type=click.Path(file_okay=False))
+@click.option("--type", "file_type", default="parquet",
+    type=click.Choice(["parquet", "arrow", "csv"]),
+    help="Type of the exported files.")
+@click.option("--partition", is_flag=True,
+    help="Partition the exported files by month.")
+@click.option("--append", is_flag=True,
+    help="Only export contributions created since the previous export.")
+@click.option("--author", "-a", multiple=True,
+    help="Only export contributions made by these authors.")
+@click.option("--moderator", "-m", multiple=True,
+    shell_complete=complete("moderators"),
+    help="Only export contributions reviewed by these moderators.")
+@click.option("--limit", type=int,
+    help="Limit the amount of accepted and rejected contributions to N each "
+    "(not with --author or --moderator).")
+def export(path, file_type, partition, append, author, moderator, limit):
+    """
+    Exports contributions to Parquet, Arrow or CSV files in the given
+    directory.
+    """
+    if file_type != "csv":
+        try:
+            import pyarrow
+        except ImportError:
+            click.echo("pyarrow is not installed, exporting to CSV instead.",
+                err=True)
+            file_type = "csv"
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    if limit and (author or moderator):
+        raise click.UsageError(
+            "--limit can't be combined with --author or --moderator.")
+
+    # Exports with different filters or files are appended to independently
+    filters = json.dumps({"author" : sorted(author),
+        "moderator" : sorted(moderator), "type" : file_type,
+        "partition" : partition}, sort_keys=True)
+    state_path = os.path.join(path, "_state.json")
+    state = {}
+    if os.path.exists(state_path):
+        with open(state_path) as state_file:
+            state = json.load(state_file)
+    since = None
+    if append and filters in state:
+        since = parse(state[filters])
+
+    if author or moderator:
+        contributions = []
+        for user in author:
+            contributions.extend(author_contributions(user))
+        for user in moderator:
+            contributions.extend(moderator_contributions(user))
+    else:
+        contributions = []
+        for status in ["any", "flagged"]:
+            for contribution in page_posts({"section" : "all",
+                "status" : status}, limit):
+                # Posts are retrieved newest first, so the rest of them have
+                # already been exported
+                if since and parse(contribution["created"]).replace(
+                    tzinfo=None) <= since:
+                    break
+                contributions.append(contribution)
+
+    partitions = {}
+    for contribution in unique_contributions(contributions):
+        record = export_record(contribution)
+        if since and record["created"] <= since:
+            continue
+        key = record["created"].strftime("%Y-%m") if partition else ""
+        partitions.setdefault(key, []).append(record)
+    if not partitions:
+        click.echo("No new contributions to export.")
+        return
+
+    # Every export gets its own files so appending never rewrites old ones,
+    # even when two exports run in the same second
+    name = "part-{}-{}.{}".format(datetime.datetime.now().strftime(
+        "%Y%m%d%H%M%S"), uuid.uuid4().hex[:8], file_type)
+    for key, records in sorted(partitions.items()):
+        directory = os.path.join(path, "month={}".format(key)) if key else path
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        write_export(os.path.join(directory, name), records, file_type)
+
+    latest = max(record["created"] for records in partitions.values()
+        for record in records)
+    if since:
+        latest = max(latest, since)
+    state[filters] = latest.isoformat()
+    with open(state_path, "w") as state_file:
+        json.dump(state, state_file, indent=4, sort_keys=True)
+    click.echo("Exported {} contributions to {}.".format(
+        sum(len(records) for records in partitions.values()), path))
+
+class Corpus(object):
+    """
+    The moderators, sponsors and contributions kept in memory by the daemon.
+    Contributions are indexed by moderator, author and project so the queries
+    made by the other commands don't have to scan all of them.
+    """
+    INDEXES = ["moderator", "author", "projectId"]
+    PARAMETERS = set(INDEXES + ["section", "platform", "status", "type",
+        "filterBy", "limit", "skip"])
+    POLL_SIZE = 500
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.moderators = None
+        self.sponsors = None
+        self.posts = {}
+        self.indexes = dict((index, {}) for index in self.INDEXES)
+
+    def index_values(self, post):
+        """
+        Returns the value of each index for the given contribution.
+        """
+        repository = post["json_metadata"].get("repository") or {}
+        project_id = repository.get("id")
+        return [
+            ("moderator", post.get("moderator")),
+            ("author", post["author"]),
+            ("projectId", str(project_id) if project_id else None)
+        ]
+
+    def add(self, post):
+        """
+        Adds the given contribution, replacing it if it was already added.
+        """
+        key = (post["author"], post["permlink"])
+        with self.lock:
+            if key in self.posts:
+                for index, value in self.index_values(self.posts[key]):
+                    self.indexes[index].get(value, set()).discard(key)
+            self.posts[key] = post
+            for index, value in self.index_values(post):
+                if value:
+                    self.indexes[index].setdefault(value, set()).add(key)
+
+    def refresh(self, full=False):
+        """
+        Updates the moderators and sponsors and retrieves the newest (or all)
+        contributions.
+        """
+        self.moderators = get_json("{}moderators".format(UTOPIAN_API))
+        self.sponsors = get_json("{}sponsors".format(UTOPIAN_API))
+        limit = None if full else self.POLL_SIZE
+        for status in ["any", "flagged"]:
+            for post in page_posts({"section" : "all", "status" : status},
+                limit):
+                self.add(post)
+        self.loaded = True
+
+    def query(self, parameters):
+        """
+        Answers a query of the posts API from memory, or returns None if it
+        can't be answered without the API.
+        """
+        status = parameters.get("status", "any")
+        if (not self.loaded or not self.PARAMETERS.issuperset(parameters) or
+            parameters.get("filterBy", "all") != "all" or
+            status not in ["any", "flagged"]):
+            return None
+
+        with self.lock:
+            keys = None
+            for index in self.INDEXES:
+                if index in parameters:
+                    matching = self.indexes[index].get(parameters[index], set())
+                    keys = matching if keys is None else keys & matching
+            if keys is None:
+                keys = self.posts.keys()
+            posts = [self.posts[key] for key in keys]
+
+        category = parameters.get("type", "all")
+        posts = [post for post in posts
+            if (status == "any" or post.get("flagged")) and
+            category in ["all", post["json_metadata"].get("type")]]
+        posts.sort(key=lambda post: post["created"], reverse=True)
+        skip = int(parameters.get("skip", 0))
+        limit = int(parameters.get("limit", 20))
+        return {"total" : len(posts), "results" : posts[skip:skip + limit]}
+
+def poll(corpus, interval):
+    """
+    Loads all contributions into the given corpus and keeps it up to date.
+    """
+    full = True
+    while True:
+        try:
+            corpus.refresh(full)
+            full = False
+        except (requests.RequestException, ValueError, KeyError,
+            TypeError) as error:
+            # The API returning an error (without results) shouldn't stop
+            # the daemon from trying again
+            click.echo("Could not refresh: {!r}".format(error), err=True)
+        time.sleep(interval)
+
+class DaemonServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+class DaemonHandler(BaseHTTPRequestHandler):
+    """
+    Answers requests of the Utopian.io API from the daemon's corpus and
+    forwards the ones it can't answer.
+    """
+    def do_GET(self):
+        corpus = self.server.corpus
+        url = urlsplit(self.path)
+        api = url.path.strip("/")
+        if api == "_utopian":
+            response = {"daemon" : DAEMON_NAME, "loaded" : corpus.loaded}
+        elif api == "moderators":
+            response = corpus.moderators
+        elif api == "sponsors":
+            response = corpus.sponsors
+        elif api == "posts":
+            response = corpus.query(dict(parse_qsl(url.query)))
+        else:
+            response = None
+
+        try:
+            if response is None:
+                response = requests.get(
+                    UTOPIAN_API + self.path.lstrip("/")).json()
+        except (requests.RequestException, ValueError):
+            self.send_error(502)
+            return
+        body = json.dumps(response).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@cli.command()
+@click.option("--interval", default=60,
+    help="Seconds between checking for new contributions.")
+def serve(interval):
+    """
+    Runs a daemon that keeps moderators, sponsors and contributions in memory
+    and answers the requests of the other commands.
+    """
+    global use_daemon, cache_responses
+    use_daemon = False
+    cache_responses = False
+    try:
+        server = DaemonServer((DAEMON_HOST, DAEMON_PORT), DaemonHandler)
+    except OSError as error:
+        raise click.ClickException("Could not listen on port {} ({}), choose "
+            "another one with UTOPIAN_DAEMON_PORT.".format(DAEMON_PORT,
+            error.strerror))
+    server.corpus = Corpus()
+    poller = threading.Thread(target=poll, args=(server.corpus, interval))
+    poller.daemon = True
+    poller.start()
+
+    click.echo("Listening on {}".format(DAEMON_URL))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()